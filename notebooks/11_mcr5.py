@@ -1,10 +1,9 @@
 import itertools
 import os
-import pickle
 import sys
 import tracemalloc
 from datetime import datetime
-from functools import partial
+from functools import lru_cache, partial
 
 import psutil
 
@@ -59,8 +58,12 @@ car_location_mappings = lm_data["car_location_mappings"]
 configs = {}
 
 
-def get_bicyle_public_transport_config_ready(bicycle_location_path, start_time):
-    initial_steps, repeating_steps = get_bicycle_public_transport_config_with_data(
+# the steps do not depend on the start time, so they are only built once for
+# each bicycle location file and shared by the configs of all times
+# (the configs are run grouped by bicycle location file, so one entry suffices)
+@lru_cache(maxsize=1)
+def get_bicycle_public_transport_steps(bicycle_location_path):
+    return get_bicycle_public_transport_config_with_data(
         geo_meta=geo_meta,
         geo_data=geo_data,
         bicycle_price_function="next_bike_no_tariff",
@@ -68,6 +71,12 @@ def get_bicyle_public_transport_config_ready(bicycle_location_path, start_time):
         structs_path=structs,
         stops_path=stops,
     )
+
+
+def get_bicyle_public_transport_config_ready(bicycle_location_path, start_time):
+    initial_steps, repeating_steps = get_bicycle_public_transport_steps(
+        bicycle_location_path
+    )
     return {
         "init_kwargs": {
             "initial_steps": initial_steps,
@@ -111,13 +120,18 @@ def get_bicycle_only_config_ready(bicycle_location_path):
     }
 
 
-def get_public_transport_only_config_ready(start_time):
-    initial_steps, repeating_steps = get_public_transport_only_config_with_data(
+@lru_cache(maxsize=None)
+def get_public_transport_only_steps():
+    return get_public_transport_only_config_with_data(
         geo_meta=geo_meta,
         geo_data=geo_data,
         structs_path=structs,
         stops_path=stops,
     )
+
+
+def get_public_transport_only_config_ready(start_time):
+    initial_steps, repeating_steps = get_public_transport_only_steps()
     return {
         "init_kwargs": {
             "initial_steps": initial_steps,
@@ -150,7 +164,7 @@ times = [
     "18:00:00",
 ]
 bicycle_location_paths = [
-    os.path.join(bicycle_base_path, path) for path in os.listdir(bicycle_base_path)
+    entry.path for entry in os.scandir(bicycle_base_path) if entry.is_file()
 ]
 
 bicycle_public_transport_config_args = list(
@@ -161,10 +175,14 @@ bicycle_public_transport_config_args = list(
 )
 
 
+config_bicycle_location_paths = {}
+
 for i, (time, bicycle_location_path) in enumerate(bicycle_public_transport_config_args):
-    configs[f"bicycle_public_transport_{i}"] = partial(
+    config_key = f"bicycle_public_transport_{i}"
+    configs[config_key] = partial(
         get_bicyle_public_transport_config_ready, bicycle_location_path, time
     )
+    config_bicycle_location_paths[config_key] = bicycle_location_path
 
 for i, time in enumerate(times):
     print(i, time)
@@ -177,17 +195,38 @@ for i, bicycle_location_path in enumerate(bicycle_location_paths):
     configs[f"bicycle_{i}"] = partial(
         get_bicycle_only_config_ready, bicycle_location_path
     )
+    config_bicycle_location_paths[f"bicycle_{i}"] = bicycle_location_path
 
 configs["car"] = get_car_only_config_ready
 configs["walking"] = get_walking_only_config_ready
 
+# run all configs of a bicycle location file back to back, so that its steps are
+# built once and its data stays warm (the sort is stable for the other configs)
+configs = dict(
+    sorted(
+        configs.items(),
+        key=lambda item: config_bicycle_location_paths.get(item[0], ""),
+    )
+)
+
+# the public transport steps are cached for their configs only, after the last one
+# has run they are released again
+last_public_transport_config_key = next(
+    (key for key in reversed(configs) if key.startswith("public_transport_")), None
+)
+
 if os.path.exists(mcr5_output_path):
     raise Exception("Output path already exists")
 
+# tracing allocations slows down every allocation, so it is opt-in
+profile_memory = bool(os.environ.get("MCR5_PROFILE"))
+
 pre_loop_memory = psutil.Process().memory_info().vms
 rlog.info("Pre Loop Memory : %s", pretty_bytes(pre_loop_memory))
-tracemalloc.start()
-snapshot1 = tracemalloc.take_snapshot()
+snapshots = []
+if profile_memory:
+    tracemalloc.start(1)
+    snapshots.append(("start", tracemalloc.take_snapshot()))
 
 runtimes = {}
 for key, config in configs.items():
@@ -195,22 +234,15 @@ for key, config in configs.items():
     rlog.info(f"Running MCR5 for {key}")
 
     config = config()
-    snapshot1 = tracemalloc.take_snapshot()
     mcr5 = MCR5(**config["init_kwargs"], max_processes=8)
 
-    snapshot2 = tracemalloc.take_snapshot()
-    top_stats = snapshot2.compare_to(snapshot1, "lineno")
-    print("[ Top 10 differences ]")
-    for stat in top_stats[:10]:
-        print(stat)
-    snapshot1 = snapshot2
+    if profile_memory:
+        snapshots.append((key, tracemalloc.take_snapshot()))
 
     memory_pre_loop = psutil.Process().memory_info().vms
-    current, peak = tracemalloc.get_traced_memory()
     rlog.info(
-        "Memory difference after mcr5 load: %s - %s",
+        "Memory difference after mcr5 load: %s",
         pretty_bytes(memory_pre_loop - pre_loop_memory),
-        pretty_bytes(current),
     )
 
     loaded_at = datetime.now()
@@ -218,12 +250,13 @@ for key, config in configs.items():
 
     output_path = os.path.join(mcr5_output_path, key)
 
-    location_mappings = config["location_mappings"]
+    # must not rebind the module-level location_mappings the config builders use
+    config_location_mappings = config["location_mappings"]
 
     start_time = config.get("start_time", "08:00:00")
 
     errors = mcr5.run(
-        location_mappings,
+        config_location_mappings,
         start_time=start_time,
         output_dir=output_path,
         max_transfers=config["max_transfers"],
@@ -244,5 +277,16 @@ for key, config in configs.items():
     )
     pre_loop_memory = memory_in_loop
 
-with open(os.path.join(mcr5_output_path, "runtimes.pkl"), "wb") as f:
-    pickle.dump(runtimes, f)
+    if key == last_public_transport_config_key:
+        get_public_transport_only_steps.cache_clear()
+        del config, mcr5  # both still reference the steps
+
+for (_, previous_snapshot), (key, snapshot) in zip(snapshots, snapshots[1:]):
+    top_stats = snapshot.compare_to(previous_snapshot, "lineno")
+    print(f"[ Top 10 differences after loading {key} ]")
+    for stat in top_stats[:10]:
+        print(stat)
+
+storage.write_any_dict(
+    runtimes, os.path.join(mcr5_output_path, "runtimes.pkl"), compress=True
+)
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from package.geometa import GeoMeta
 from package.logger import Timed
 from package.mcr.data import NetworkType, OSMData
@@ -22,9 +24,20 @@ ALL_CONFIGS = [
 ]
 
 
-def get_car_only_config_with_data(geo_meta, geo_data):
+@lru_cache(maxsize=1)
+def get_pois(geo_meta, geo_data):
+    """
+    POIs only depend on the boundary and the walking network, so they are shared by
+    all configs that are built from the same geo meta and geo data.
+    Only the latest call is cached, the cache holds a reference to the geo data and
+    must not keep the data of previously loaded areas alive.
+    """
     with Timed.info("Fetching POI for runtime optimization"):
-        pois = minute_city.fetch_pois_for_area(geo_meta.boundary, geo_data.osm_nodes)  # type: ignore
+        return minute_city.fetch_pois_for_area(geo_meta.boundary, geo_data.osm_nodes)  # type: ignore
+
+
+def get_car_only_config_with_data(geo_meta, geo_data):
+    pois = get_pois(geo_meta, geo_data)
 
     driving_nodes, driving_edges, _ = geo_data.additional_networks[NetworkType.DRIVING]
     car_step = PersonalCarStepBuilder(
@@ -48,8 +61,7 @@ def get_bicycle_public_transport_config_with_data(
     structs_path: str,
     stops_path: str,
 ):
-    with Timed.info("Fetching POI for runtime optimization"):
-        pois = minute_city.fetch_pois_for_area(geo_meta.boundary, geo_data.osm_nodes)  # type: ignore
+    pois = get_pois(geo_meta, geo_data)
 
     cycling_nodes, cycling_edges, _ = geo_data.additional_networks[NetworkType.CYCLING]
     bicycle_step = BicycleStepBuilder(
@@ -90,8 +102,7 @@ def get_bicycle_only_config_with_data(
     bicycle_price_function: str,
     bicycle_location_path: str,
 ):
-    with Timed.info("Fetching POI for runtime optimization"):
-        pois = minute_city.fetch_pois_for_area(geo_meta.boundary, geo_data.osm_nodes)  # type: ignore
+    pois = get_pois(geo_meta, geo_data)
 
     cycling_nodes, cycling_edges, _ = geo_data.additional_networks[NetworkType.CYCLING]
     bicycle_step = BicycleStepBuilder(
@@ -121,8 +132,7 @@ def get_bicycle_only_config_with_data(
 
 
 def get_walking_only_config_with_data(geo_meta, geo_data):
-    with Timed.info("Fetching POI for runtime optimization"):
-        pois = minute_city.fetch_pois_for_area(geo_meta.boundary, geo_data.osm_nodes)  # type: ignore
+    pois = get_pois(geo_meta, geo_data)
 
     walking_step = WalkingStepBuilder(
         geo_data.osm_nodes,
@@ -142,8 +152,7 @@ def get_public_transport_only_config_with_data(
     structs_path: str,
     stops_path: str,
 ):
-    with Timed.info("Fetching POI for runtime optimization"):
-        pois = minute_city.fetch_pois_for_area(geo_meta.boundary, geo_data.osm_nodes)  # type: ignore
+    pois = get_pois(geo_meta, geo_data)
 
     walking_step = WalkingStepBuilder(
         geo_data.osm_nodes,
@@ -1,25 +1,43 @@
-import hashlib
 import os
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
+import xxhash
 from pandas.util import hash_pandas_object
 from shapely.geometry import Polygon
 
 from package import storage
 
 tempdir = storage.get_tmp_path()
+os.makedirs(tempdir, exist_ok=True)
+
+# cache keys are xxh128 digests, they are not used for anything security related
+HASH_BYTES = 16
 
 
 def hash_gdf(gdf: gpd.GeoDataFrame) -> int:
-    return int(
-        hashlib.sha256(hash_pandas_object(gdf, index=True).values).hexdigest(),  # type: ignore
-        16,
-    )
+    # hashing column by column avoids materializing row hashes for the whole frame
+    h = xxhash.xxh128()
+    for values in [gdf.index, *(column for _, column in gdf.items())]:
+        # frames each buffer so that shifted column boundaries or dtypes change the hash
+        h.update(len(gdf).to_bytes(HASH_BYTES, "little"))
+        h.update(len(gdf.columns).to_bytes(HASH_BYTES, "little"))
+        h.update(str(values.dtype).encode("utf-8"))
+        h.update(get_hashable_buffer(values))
+    return h.intdigest()
+
+
+def get_hashable_buffer(values: pd.Series | pd.Index) -> np.ndarray:
+    array = values.to_numpy()
+    if array.dtype.hasobject:
+        # python objects (e.g. strings or geometries) have no stable raw memory
+        return hash_pandas_object(values, index=False).to_numpy()
+    return np.ascontiguousarray(array).view(np.uint8)
 
 
 def hash_str(s: str) -> int:
-    return int(hashlib.sha256(s.encode("utf-8")).hexdigest(), 16)
+    return xxhash.xxh128_intdigest(s.encode("utf-8"))
 
 
 def hash_polygon(polygon: Polygon) -> int:
@@ -27,26 +45,20 @@ def hash_polygon(polygon: Polygon) -> int:
 
 
 def combine_hashes(hashes: list[int]) -> int:
-    return int(
-        hashlib.sha256("".join([str(h) for h in hashes]).encode("utf-8"))
-        .digest()
-        .hex(),
-        16,
-    )
+    h = xxhash.xxh128()
+    for hash in hashes:
+        h.update(hash.to_bytes(HASH_BYTES, "little"))
+    return h.intdigest()
 
 
 def cache_gdf(df: pd.DataFrame, hash: int, identifier: str):
-    if not os.path.exists(tempdir):
-        os.mkdir(tempdir)
     path = os.path.join(tempdir, f"{identifier}_{hash}")
-    df.to_feather(path)
-    # df.to_file(path)
+    df.to_parquet(path, engine="pyarrow", compression="zstd", compression_level=3)
 
 
 def read_gdf(hash: int, identifier: str) -> gpd.GeoDataFrame:
     path = os.path.join(tempdir, f"{identifier}_{hash}")
-    # return gpd.read_file(path)
-    return gpd.read_feather(path)
+    return gpd.read_parquet(path)
 
 
 def cache_entry_exists(hash: int, identifier: str) -> bool:
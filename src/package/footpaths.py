@@ -2,12 +2,15 @@ import os
 from enum import Enum
 
 import geopandas as gpd
+import numpy as np
 
 from package import storage
 from package.geometa import GeoMeta
 from package.logger import Timed, rlog
 from package.osm import graph, igraph, osm
 
+BEELINE_DISTANCE_CRS = "EPSG:32634"
+
 
 class GenerationMethod(Enum):
     IGRAPH = "igraph"
@@ -56,9 +59,12 @@ def generate(
     with Timed.info("Adding nearest network node to each stop"):
         stops_df = graph.add_nearest_node_to_stops(stops_df, nx_graph)
 
+    # crs for beeline distance
+    projected_stops_df = stops_df.to_crs(BEELINE_DISTANCE_CRS)
+
     with Timed.info("Finding potential nearby stops for each stop"):
         nearby_stops_map = create_nearby_stops_map(
-            stops_df, avg_walking_speed, max_walking_duration
+            projected_stops_df, avg_walking_speed, max_walking_duration
         )
 
     stop_to_node_map: dict[str, int] = stops_df.set_index("stop_id")[
@@ -68,29 +74,54 @@ def generate(
         "stop_id"
     ].to_dict()
 
-    # this map contains the one-to-many queries that have to be solved on the graph
-    source_targets_map: dict[int, list[int]] = {
-        stop_to_node_map[stop_id]: [
-            stop_to_node_map[stop_id] for stop_id in nearby_stops
-        ]
-        for stop_id, nearby_stops in nearby_stops_map.items()
-    }
+    # the layout is described on query_multiple_one_to_many
+    sources = np.fromiter(
+        (stop_to_node_map[stop_id] for stop_id in nearby_stops_map),
+        dtype=np.int64,
+        count=len(nearby_stops_map),
+    )
+    targets = np.fromiter(
+        (
+            stop_to_node_map[stop_id]
+            for nearby_stops in nearby_stops_map.values()
+            for stop_id in nearby_stops
+        ),
+        dtype=np.int64,
+    )
+    indptr = np.zeros(len(sources) + 1, dtype=np.int64)
+    np.cumsum(
+        [len(nearby_stops) for nearby_stops in nearby_stops_map.values()],
+        out=indptr[1:],
+    )
 
     with Timed.info(f"Calculating distances between nearby stops using {method.name}"):
         if method == GenerationMethod.IGRAPH:
-            source_targets_distance_map = igraph.query_multiple_one_to_many(
-                source_targets_map, osm_reader, nodes, edges
+            source_nodes, target_nodes, distances = igraph.query_multiple_one_to_many(
+                sources, indptr, targets, osm_reader, nodes, edges
             )
         elif method == GenerationMethod.FAST_PATH:
             raise NotImplementedError()
 
-    footpaths: dict[str, dict[str, int]] = {}
-    for source_node, targets_distance_map in source_targets_distance_map.items():
-        stop_id = node_to_stop_map[source_node]
-        footpaths[stop_id] = {  # type: ignore
-            node_to_stop_map[target_node]: int(distance / avg_walking_speed)
-            for target_node, distance in targets_distance_map.items()
-        }
+    durations = (distances / avg_walking_speed).astype(np.int64)
+
+    order = np.argsort(source_nodes, kind="stable")
+    source_nodes, target_nodes = source_nodes[order], target_nodes[order]
+    durations = durations[order]
+    unique_source_nodes, group_starts = np.unique(source_nodes, return_index=True)
+
+    to_stop_id = node_to_stop_map.__getitem__
+    # stops without any reachable nearby stop keep an empty footpath map
+    footpaths: dict[str, dict[str, int]] = {
+        to_stop_id(source_node): {} for source_node in sources
+    }
+    for source_node, group_target_nodes, group_durations in zip(
+        unique_source_nodes,
+        np.split(target_nodes, group_starts[1:]),
+        np.split(durations, group_starts[1:]),
+    ):
+        footpaths[to_stop_id(source_node)] = dict(
+            zip(map(to_stop_id, group_target_nodes), group_durations.tolist())
+        )
 
     return footpaths
 
@@ -100,19 +131,35 @@ def create_nearby_stops_map(
     avg_walking_speed: float,
     max_walking_duration: int,
 ) -> dict[str, list[str]]:
-    # crs for beeline distance
-    stops_df = stops_df.copy().set_crs("EPSG:4326").to_crs("EPSG:32634")  # type: ignore
-
+    """
+    Finds all stops within the maximum walking distance of each stop.
+    The stops are expected to be projected to BEELINE_DISTANCE_CRS.
+    """
     max_walking_distance = avg_walking_speed * max_walking_duration
 
-    nearby_stops_map: dict[str, list[str]] = {}
-    for _, row in stops_df.iterrows():
-        nearby_stops = stops_df.loc[
-            stops_df.geometry.distance(row.geometry) < max_walking_distance
-        ].stop_id.tolist()
-
-        # remove self
-        nearby_stops = [stop_id for stop_id in nearby_stops if stop_id != row.stop_id]
-        nearby_stops_map[row.stop_id] = nearby_stops
+    stop_ids = stops_df["stop_id"].to_numpy()
+    geometries = stops_df.geometry.values
+
+    # the spatial index yields all candidate pairs whose bounding boxes are in
+    # reach, the exact beeline distance is then checked for all pairs at once.
+    # Only the bounding box of the buffer matters, which a single segment per
+    # quarter circle (a diamond) already spans exactly.
+    source_idx, target_idx = stops_df.sindex.query(
+        stops_df.geometry.buffer(max_walking_distance, resolution=1)
+    )
+    is_nearby = (source_idx != target_idx) & (
+        geometries[source_idx].distance(geometries[target_idx]) < max_walking_distance
+    )
+    source_idx, target_idx = source_idx[is_nearby], target_idx[is_nearby]
+
+    order = np.argsort(source_idx, kind="stable")
+    source_idx, target_idx = source_idx[order], target_idx[order]
+    group_bounds = np.searchsorted(source_idx, np.arange(1, len(stop_ids)))
+    nearby_stops_per_stop = np.split(stop_ids[target_idx], group_bounds)
+
+    nearby_stops_map: dict[str, list[str]] = {
+        stop_id: nearby_stops.tolist()
+        for stop_id, nearby_stops in zip(stop_ids, nearby_stops_per_stop)
+    }
 
     return nearby_stops_map
@@ -1,10 +1,14 @@
 import geopandas as gpd
+import numpy as np
 import pandas as pd
 
 from package import key
 from package.gtfs import archive
 from package.logger import Timed
 
+ID_KEYS = [key.TRIP_ID_KEY, key.ROUTE_ID_KEY, key.STOP_ID_KEY]
+PATH_SEPARATOR = "|"
+
 
 def clean(gtfs_zip_path: str) -> dict[str, pd.DataFrame]:
     """
@@ -20,6 +24,7 @@ def clean(gtfs_zip_path: str) -> dict[str, pd.DataFrame]:
         dfs[key.STOPS_KEY],
         dfs[key.ROUTES_KEY],
     )
+    categorize_ids([trips_df, stop_times_df, stops_df, routes_df])
 
     with Timed.info("Removing incompatible trips"):
         trips_df, stop_times_df = remove_circular_trips(trips_df, stop_times_df)
@@ -39,6 +44,20 @@ def clean(gtfs_zip_path: str) -> dict[str, pd.DataFrame]:
     }
 
 
+def categorize_ids(dfs: list[pd.DataFrame]):
+    """
+    Converts the id columns to categoricals sharing their categories across all
+    dataframes, so that merges and groupbys operate on the integer codes.
+    """
+    for id_key in ID_KEYS:
+        dfs_with_id = [df for df in dfs if id_key in df.columns]
+        ids = pd.concat([df[id_key] for df in dfs_with_id], ignore_index=True)
+        # sorted, so that ordering by an id column still orders by the id itself
+        id_dtype = pd.CategoricalDtype(np.sort(ids.dropna().unique().astype(object)))
+        for df in dfs_with_id:
+            df[id_key] = df[id_key].astype(id_dtype)
+
+
 def remove_circular_trips(
     trips_df: pd.DataFrame,
     stop_times_df: pd.DataFrame,
@@ -48,19 +67,18 @@ def remove_circular_trips(
 
     Circular paths are not supported by our algorithms.
     """
-    circular_trips = stop_times_df.groupby("trip_id").apply(is_circular_trip)
-    circular_trips = circular_trips[circular_trips].index
+    stop_ids_by_trip = stop_times_df.groupby("trip_id", observed=True, sort=False)[
+        "stop_id"
+    ]
+    is_circular = stop_ids_by_trip.nunique().ne(stop_ids_by_trip.size())
+    circular_trips = is_circular.index[is_circular.to_numpy()]
 
-    trips_df = trips_df[~trips_df["trip_id"].isin(circular_trips)].copy()
-    stop_times_df = stop_times_df[~stop_times_df["trip_id"].isin(circular_trips)].copy()
+    trips_df = trips_df[~trips_df["trip_id"].isin(circular_trips)]
+    stop_times_df = stop_times_df[~stop_times_df["trip_id"].isin(circular_trips)]
 
     return trips_df, stop_times_df
 
 
-def is_circular_trip(stop_times_df: pd.DataFrame) -> bool:
-    return stop_times_df["stop_id"].nunique() != len(stop_times_df)
-
-
 def split_routes(
     trips_df: pd.DataFrame, stop_times_df: pd.DataFrame, routes_df: pd.DataFrame
 ) -> tuple[pd.DataFrame, pd.DataFrame]:
@@ -73,7 +91,8 @@ def split_routes(
     For our algorithms it is easier to have one route per path.
     """
     # first we backup the old route_ids for debugging purposes
-    trips_df["old_route_id"] = trips_df["route_id"]
+    # (assign also detaches trips_df from the frame it was filtered from)
+    trips_df = trips_df.assign(old_route_id=trips_df["route_id"])
 
     split_routes_by_direction(trips_df)
     paths_df = create_paths_df(trips_df, stop_times_df)
@@ -85,24 +104,44 @@ def split_routes(
 
 
 def split_routes_by_direction(trips_df: pd.DataFrame):
-    trips_df["route_id"] = (
-        trips_df["route_id"] + "_" + trips_df["direction_id"].astype(str)
+    """
+    Appends the direction to the route_id of each trip.
+
+    The new ids are built on the categorical codes, so only one string is created
+    per route and direction instead of one per trip.
+    """
+    route_ids = trips_df["route_id"].astype("category")
+    direction_codes, directions = pd.factorize(
+        trips_df["direction_id"], sort=True, use_na_sentinel=False
+    )
+    direction_labels = [str(direction) for direction in directions]
+
+    route_codes = route_ids.cat.codes.to_numpy(np.int64)
+    codes = np.where(
+        route_codes >= 0, route_codes * len(directions) + direction_codes, -1
     )
+    categories = [
+        f"{route_id}_{direction}"
+        for route_id in route_ids.cat.categories
+        for direction in direction_labels
+    ]
+    trips_df["route_id"] = pd.Categorical.from_codes(
+        codes, categories
+    ).remove_unused_categories()
 
 
 def create_paths_df(
     trips_df: pd.DataFrame, stop_times_df: pd.DataFrame
 ) -> pd.DataFrame:
     """
-    Creates a dataframe route_id, trip_id, and path, where path is a string
-    representation of the stops on the route in order.
+    Creates a dataframe route_id, trip_id, and path, where path is the
+    `PATH_SEPARATOR` joined stop ids of the route in order.
     """
     trips_stop_times_df = pd.merge(trips_df, stop_times_df, on="trip_id")
     paths_df = (
         trips_stop_times_df.sort_values(["route_id", "trip_id", "stop_sequence"])
-        .groupby(["route_id", "trip_id"])["stop_id"]
-        .apply(list)
-        .apply(str)
+        .groupby(["route_id", "trip_id"], observed=True, sort=False)["stop_id"]
+        .agg(PATH_SEPARATOR.join)
         .reset_index()
     )
     paths_df = paths_df.rename(columns={"stop_id": "path"})
@@ -114,33 +153,12 @@ def add_unique_route_ids(paths_df: pd.DataFrame) -> pd.DataFrame:
     Adds a new column `new_route_id` to the dataframe, which is a unique route_id
     for each path.
     """
-    known_route_paths = {}
-    path_counter_per_route = {}
-    path_id_by_path = {}
+    route_paths = paths_df[["route_id", "path"]].drop_duplicates()
+    path_numbers = route_paths.groupby("route_id", observed=True, sort=False).cumcount()
+    path_ids = path_numbers.map(lambda path_number: chr(ord("A") + path_number))
+    route_paths["new_route_id"] = route_paths["route_id"].astype(str) + "_" + path_ids
 
-    paths_df["new_route_id"] = paths_df["route_id"]
-
-    for i, row in paths_df.iterrows():
-        path_counter = path_counter_per_route.get(row["route_id"], 0)
-        known_paths = known_route_paths.get(row["route_id"], set())
-
-        path_id = None
-
-        path = row["path"]
-        if path in known_paths:
-            path_id = path_id_by_path[path]
-        else:
-            path_id = chr(ord("A") + path_counter)
-            paths_df.at[i, "new_route_id"] = row["route_id"] + "_" + path_id
-
-            known_paths.add(path)
-            known_route_paths[row["route_id"]] = known_paths
-
-            path_counter_per_route[row["route_id"]] = path_counter + 1
-
-            path_id_by_path[path] = path_id
-
-        paths_df.at[i, "new_route_id"] = row["route_id"] + "_" + path_id
+    paths_df = paths_df.merge(route_paths, on=["route_id", "path"], how="left")
 
     return paths_df.drop(columns=["path"])  # we don't need the path column anymore
 
@@ -157,31 +175,28 @@ def insert_new_routes(routes_df: pd.DataFrame, trips_df: pd.DataFrame) -> pd.Dat
     Reads the old and new route names of each trip and inserts the new routes into
     the routes_df by copying the old routes.
     """
-    new_rows = []
-
-    route_id_map = trips_df.set_index("route_id")["old_route_id"].to_dict()
-    # Iterate over each row in the trips_df
-    for route_id, old_route_id in route_id_map.items():
-        # Find the corresponding row in the routes_df based on old_route_id
-        old_route_row = routes_df[routes_df["route_id"] == old_route_id].iloc[0]
-
-        # Create a new row by copying the old route row and update the route_id
-        new_route_row = old_route_row.copy()
-        new_route_row["route_id"] = route_id
-
-        new_rows.append(new_route_row)
+    route_id_map = trips_df[["route_id", "old_route_id"]].drop_duplicates("route_id")
+    new_routes_df = route_id_map.merge(
+        routes_df.drop_duplicates("route_id"),
+        left_on="old_route_id",
+        right_on="route_id",
+        how="left",
+        suffixes=("", "_old"),
+    )
 
-    return pd.DataFrame(new_rows)
+    return new_routes_df[routes_df.columns]
 
 
 def add_first_stop_info(
     trips_df: pd.DataFrame, stop_times_df: pd.DataFrame
 ) -> pd.DataFrame:
     # add first stop id to trips
+    first_stop_indices = stop_times_df.groupby("trip_id", observed=True, sort=False)[
+        "stop_sequence"
+    ].idxmin()
     first_stop_times = (
-        stop_times_df.sort_values(["trip_id", "stop_sequence"])
-        .groupby("trip_id")
-        .first()[["stop_id", "departure_time"]]
+        stop_times_df.loc[first_stop_indices, ["trip_id", "stop_id", "departure_time"]]
+        .set_index("trip_id")
         .rename(
             columns={
                 "stop_id": "first_stop_id",
@@ -198,12 +213,17 @@ def add_first_stop_info(
 def remove_unused_stops(
     stop_times_df: pd.DataFrame, stops_df: pd.DataFrame
 ) -> pd.DataFrame:
-    stops_df = stops_df[stops_df["stop_id"].isin(stop_times_df["stop_id"])]
+    used_stop_ids = stop_times_df["stop_id"].unique()
+    stops_df = stops_df[stops_df["stop_id"].isin(used_stop_ids)]
     return stops_df
 
 
 def add_geometry(stops_df: pd.DataFrame) -> pd.DataFrame:
     return gpd.GeoDataFrame(
         stops_df,
-        geometry=gpd.points_from_xy(stops_df.stop_lon, stops_df.stop_lat),
+        geometry=gpd.points_from_xy(
+            stops_df["stop_lon"].to_numpy(),
+            stops_df["stop_lat"].to_numpy(),
+            crs="EPSG:4326",
+        ),
     )
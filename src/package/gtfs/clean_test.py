@@ -3,8 +3,10 @@ import pandas as pd
 from package.gtfs.clean import (
     add_first_stop_info,
     add_unique_route_ids,
+    categorize_ids,
     create_paths_df,
     remove_unused_stops,
+    split_routes,
     split_routes_by_direction,
 )
 
@@ -13,7 +15,7 @@ def test_split_routes_by_direction(trips_df: pd.DataFrame):
     split_routes_by_direction(trips_df)
 
     expected_route_ids = pd.Series(
-        ["route1_0", "route1_0", "route1_1"], name="route_id"
+        ["route1_0", "route1_0", "route1_1"], name="route_id", dtype="category"
     )
     pd.testing.assert_series_equal(trips_df["route_id"], expected_route_ids)
 
@@ -22,9 +24,9 @@ def test_create_paths_df(trips_df: pd.DataFrame, stop_times_df: pd.DataFrame):
     paths_df = create_paths_df(trips_df, stop_times_df)
     expected_paths = pd.Series(
         [
-            "['stop1', 'stop2', 'stop3']",
-            "['stop1', 'stop4', 'stop3']",
-            "['stop3', 'stop2', 'stop1']",
+            "stop1|stop2|stop3",
+            "stop1|stop4|stop3",
+            "stop3|stop2|stop1",
         ],
         name="path",
     )
@@ -57,3 +59,30 @@ def test_remove_unused_stops(stop_times_df: pd.DataFrame, stops_df: pd.DataFrame
     stops_df = remove_unused_stops(stop_times_df, stops_df)
     expected_stops = pd.Series(["stop1", "stop2", "stop3", "stop4"], name="stop_id")
     pd.testing.assert_series_equal(stops_df["stop_id"], expected_stops)
+
+
+def test_categorize_ids(trips_df: pd.DataFrame, stop_times_df: pd.DataFrame):
+    categorize_ids([trips_df, stop_times_df])
+
+    assert isinstance(trips_df["trip_id"].dtype, pd.CategoricalDtype)
+    assert trips_df["trip_id"].dtype == stop_times_df["trip_id"].dtype
+    assert isinstance(stop_times_df["stop_id"].dtype, pd.CategoricalDtype)
+    assert list(trips_df["trip_id"]) == ["trip1", "trip2", "trip3"]
+
+
+def test_categorized_path_ids_follow_trip_id_order(
+    trips_df: pd.DataFrame, stop_times_df: pd.DataFrame, routes_df: pd.DataFrame
+):
+    # trip2 is listed first, but trip1 still has to get the first path id
+    trips_df = trips_df.iloc[::-1].reset_index(drop=True)
+    stop_times_df = stop_times_df.iloc[::-1].reset_index(drop=True)
+    categorize_ids([trips_df, stop_times_df, routes_df])
+
+    trips_df, _ = split_routes(trips_df, stop_times_df, routes_df)
+
+    route_ids = trips_df.set_index("trip_id")["route_id"].to_dict()
+    assert route_ids == {
+        "trip1": "route1_0_A",
+        "trip2": "route1_0_B",
+        "trip3": "route1_1_A",
+    }
@@ -1,14 +1,13 @@
-from multiprocessing import Pool
-from typing import Callable, Optional
+from typing import Any, Callable, Iterable, Optional
 
 import folium
+import geopandas as gpd
 import numpy as np
 import pandas as pd
 from branca.colormap import LinearColormap
 from branca.element import MacroElement, Template
 from h3 import h3
-
-from package import key
+from shapely.geometry import Polygon
 
 
 def add_h3_cell_id_to_df(df: pd.DataFrame, resolution: int) -> pd.DataFrame:
@@ -16,30 +15,20 @@ def add_h3_cell_id_to_df(df: pd.DataFrame, resolution: int) -> pd.DataFrame:
     Add a column to the dataframe with the H3 cell ID for the given resolution.
     Expected columns are "lat" and "lon".
     """
-    df["h3_cell_id"] = df.apply(
-        lambda row: h3.geo_to_h3(row["lat"], row["lon"], resolution), axis=1
+    df["h3_cell_id"] = geo_to_h3_cells(
+        df["lat"].to_numpy(), df["lon"].to_numpy(), resolution
     )
     return df
 
 
-def process_batch(df_batch, resolution):
-    df_batch["h3_cell_id"] = df_batch.apply(
-        lambda row: h3.geo_to_h3(row["lat"], row["lon"], resolution), axis=1
-    )
-    return df_batch
-
-
-def add_h3_cell_id_to_df_with_batching(
-    df: pd.DataFrame, resolution: int, n_batches: int
-) -> pd.DataFrame:
-    dfs = np.array_split(df, n_batches)
-
-    with Pool(processes=key.DEFAULT_N_PROCESSES) as pool:
-        results = pool.starmap(
-            process_batch, [(df_batch, resolution) for df_batch in dfs]
-        )
-
-    return pd.concat(results, ignore_index=True)
+def geo_to_h3_cells(lats: np.ndarray, lons: np.ndarray, resolution: int) -> list[str]:
+    """
+    Returns the H3 cell ID for each coordinate.
+    """
+    return [
+        h3.geo_to_h3(lat, lon, resolution)
+        for lat, lon in zip(np.asarray(lats).tolist(), np.asarray(lons).tolist())
+    ]
 
 
 def plot_h3_cells_discrete_colors_on_folium(
@@ -48,24 +37,39 @@ def plot_h3_cells_discrete_colors_on_folium(
     color_scheme: dict[str, str],
     fill_opacity: float = 1,
 ):
-    for h3_cell in h3_cells:
-        geo_boundary = list(h3.h3_to_geo_boundary(h3_cell))
-        geo_boundary.append(geo_boundary[0])
-
-        value = h3_cells[h3_cell]
-        color = color_scheme[value]
-
-        folium.Polygon(
-            locations=geo_boundary,
-            color=color,
-            weight=0.2,
-            opacity=1,
-            fill_opacity=fill_opacity,
-            fill_color=color,
-        ).add_to(folium_map)
+    cells_gdf = get_h3_cells_gdf(h3_cells)
+    cells_gdf["color"] = [color_scheme[h3_cells[cell]] for cell in cells_gdf.h3_cell]
+
+    folium.GeoJson(
+        cells_gdf,
+        style_function=lambda feature: {
+            "color": feature["properties"]["color"],
+            "weight": 0.2,
+            "opacity": 1,
+            "fillColor": feature["properties"]["color"],
+            "fillOpacity": fill_opacity,
+        },
+    ).add_to(folium_map)
     add_legend_to_map(folium_map, color_scheme, fill_opacity)
 
 
+def get_h3_cells_gdf(h3_cells: Iterable[str]) -> gpd.GeoDataFrame:
+    """
+    Creates a GeoDataFrame with the boundary polygon of each H3 cell.
+    The cell IDs are stored in the column "h3_cell".
+    Plotting it as a single GeoJson layer renders much faster than one polygon
+    per cell.
+    """
+    cells = list(h3_cells)
+    return gpd.GeoDataFrame(
+        {"h3_cell": cells},
+        geometry=[
+            Polygon(h3.h3_to_geo_boundary(cell, geo_json=True)) for cell in cells
+        ],
+        crs="EPSG:4326",
+    )
+
+
 def add_legend_to_map(
     folium_map: folium.Map,
     color_scheme: dict[str, str],
@@ -186,8 +190,17 @@ def plot_h3_cells_on_folium(
     legend_caption: str = "",
 ) -> None:
     is_dict = isinstance(h3_cells, dict)
+    cells = list(h3_cells)
+    values: list = list(h3_cells.values()) if is_dict else [None] * len(cells)
+    value_array = (
+        np.fromiter(values, dtype=np.float64, count=len(values))
+        if is_dict
+        else np.zeros(len(cells))
+    )
     maximum_value = (
-        maximum if maximum is not None else (max(h3_cells.values()) if is_dict else 0)
+        maximum
+        if maximum is not None
+        else (value_array.max().item() if is_dict and len(cells) > 0 else 0)
     )
 
     if show_legend:
@@ -201,33 +214,49 @@ def plot_h3_cells_on_folium(
         colormap.caption = legend_caption
         colormap.add_to(folium_map)
 
-    for h3_cell in h3_cells:
-        geo_boundary = list(h3.h3_to_geo_boundary(h3_cell))
-        geo_boundary.append(geo_boundary[0])
-
-        opacity = 0
-        value = None
-        if is_dict:
-            value = h3_cells[h3_cell]
-            opacity = value / maximum_value
-            if reverse_color:
-                opacity = 1 - opacity
-
-        popup = None
-        if popup_callback:
-            if popup_callback.__code__.co_argcount == 1:
-                popup = popup_callback(value)
-            elif popup_callback.__code__.co_argcount == 2:
-                popup = popup_callback(h3_cell, value)
-        else:
-            popup = (f"Value: {value}" if value else None,)
-
-        folium.Polygon(
-            locations=geo_boundary,
-            color=color,
-            weight=0.2,
-            opacity=1,
-            fill_color=color,
-            fill_opacity=opacity,
-            popup=popup,
-        ).add_to(folium_map)
+    get_popup = get_popup_function(popup_callback)
+
+    opacities = np.zeros(len(cells))
+    if is_dict:
+        if maximum_value:
+            opacities = value_array / maximum_value
+        if reverse_color:
+            opacities = 1 - opacities
+
+    cells_gdf = get_h3_cells_gdf(cells)
+    cells_gdf["fill_opacity"] = opacities
+    popups = [get_popup(h3_cell, value) for h3_cell, value in zip(cells, values)]
+    has_popups = any(popup is not None for popup in popups)
+    if has_popups:
+        cells_gdf["popup"] = [None if p is None else str(p) for p in popups]
+
+    folium.GeoJson(
+        cells_gdf,
+        style_function=lambda feature: {
+            "color": color,
+            "weight": 0.2,
+            "opacity": 1,
+            "fillColor": color,
+            "fillOpacity": feature["properties"]["fill_opacity"],
+        },
+        popup=(
+            folium.GeoJsonPopup(fields=["popup"], labels=False) if has_popups else None
+        ),
+    ).add_to(folium_map)
+
+
+def get_popup_function(
+    popup_callback: Optional[Callable],
+) -> Callable[[str, Any], Any]:
+    """
+    Returns a function that creates the popup for a cell and its value.
+    The popup callback can either take the value or the cell and the value as arguments,
+    this is resolved once instead of for every cell.
+    """
+    if popup_callback is None:
+        return lambda _, value: f"Value: {value}" if value else None
+    if popup_callback.__code__.co_argcount == 1:
+        return lambda _, value: popup_callback(value)
+    if popup_callback.__code__.co_argcount == 2:
+        return popup_callback
+    return lambda _, __: None
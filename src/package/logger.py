@@ -1,7 +1,7 @@
 import inspect
-import io
 import logging
 import pathlib
+from collections import deque
 from logging import CRITICAL, DEBUG, ERROR, INFO, WARNING
 from time import time
 
@@ -123,11 +123,36 @@ def format_duration(duration: float) -> str:
     return f"{duration // 3600}:{(duration % 3600) // 60:02d}:{duration % 60:02d} hours"
 
 
-def make_string_stream_logger(name: str | None, level: int = logging.INFO):
-    log_stream = io.StringIO()
+DEFAULT_LOG_BUFFER_SIZE = 500
+
+
+class DequeHandler(logging.Handler):
+    """
+    Keeps only the last `maxlen` formatted records in memory.
+    """
+
+    def __init__(self, maxlen: int = DEFAULT_LOG_BUFFER_SIZE):
+        super().__init__()
+        self.buffer: deque[str] = deque(maxlen=maxlen)
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.buffer.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def getvalue(self) -> str:
+        return "\n".join(self.buffer)
+
+
+def make_deque_logger(
+    name: str | None,
+    level: int = logging.INFO,
+    maxlen: int = DEFAULT_LOG_BUFFER_SIZE,
+) -> tuple[logging.Logger, DequeHandler]:
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    handler = logging.StreamHandler(log_stream)
+    handler = DequeHandler(maxlen)
     handler.setLevel(level)
     formatter = logging.Formatter(
         "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -135,7 +160,7 @@ def make_string_stream_logger(name: str | None, level: int = logging.INFO):
     handler.setFormatter(formatter)
     logger.addHandler(handler)
 
-    return logger, log_stream
+    return logger, handler
 
 
 def copy_settings_to_root_logger(logger: logging.Logger):
@@ -1,8 +1,11 @@
 import logging
+import multiprocessing
 import os
 import pickle
-import time
-from multiprocessing import Process, Queue
+from multiprocessing.connection import wait
+from multiprocessing.process import BaseProcess
+from multiprocessing.queues import Queue
+from queue import Empty
 
 import psutil
 from tqdm.auto import tqdm
@@ -10,7 +13,7 @@ from tqdm.auto import tqdm
 from package import key
 from package.logger import (
     copy_settings_to_root_logger,
-    make_string_stream_logger,
+    make_deque_logger,
     rlog,
 )
 from package.mcr.config import MCRConfig
@@ -18,6 +21,8 @@ from package.mcr.mcr import MCR, StepBuilderMatrix
 from package.mcr.output import OutputFormat
 from package.mcr5.h3_osm_interaction import H3OSMLocationMapping
 
+SCHEDULER_TIMEOUT_SECONDS = 1.0
+
 
 class MCR5:
     def __init__(
@@ -45,66 +50,60 @@ class MCR5:
         Returns a list of tuples, which represent errors that occurred during the analysis.
         The first element of the tuple is the h3 cell, the second element is the exception.
         """
-        processes = []
-        errors = Queue(maxsize=-1)
-
-        p_id_hex_id_map = {}
+        mp_context = get_mp_context()
+        errors = mp_context.Queue()
+        # running processes by their sentinel, along with the cell they run for
+        running: dict[int, tuple[BaseProcess, H3OSMLocationMapping]] = {}
 
         # ensure ouptput directory exists
         os.makedirs(output_dir, exist_ok=True)
+        # joined once here, each cell only appends its file name
+        output_prefix = os.path.join(output_dir, "")
 
         errors_list = []
         pbar = tqdm(location_mappings, desc="Starting")
-        for location_mapping in location_mappings:
-            h3_cell = location_mapping.h3_cell
-            osm_node_id = location_mapping.osm_node_id
-
+        for started, location_mapping in enumerate(location_mappings):
             while (
-                self.get_active_process_count(processes) >= self.max_processes
+                len(running) >= self.max_processes
                 or get_available_memory() < self.min_free_memory
             ):
-                errors_list.extend([errors.get() for _ in range(errors.qsize())])
-                if errors.full():
-                    raise Exception("Error queue is full.")
                 if verbose:
-                    self.print_status(processes, pbar)
-                time.sleep(1)
-
-            p = Process(
+                    self.print_status(started, len(running), pbar)
+                errors_list.extend(
+                    wait_for_processes(
+                        running, errors, start_time, max_transfers, output_prefix
+                    )
+                )
+
+            p = mp_context.Process(
                 target=self.run_mcr,
                 kwargs={
                     "errors": errors,
-                    "h3_cell": h3_cell,
-                    "osm_node_id": osm_node_id,
-                    "initial_steps": self.initial_steps,
-                    "repeating_steps": self.repeating_steps,
+                    "h3_cell": location_mapping.h3_cell,
+                    "osm_node_id": location_mapping.osm_node_id,
                     "start_time": start_time,
                     "max_transfers": max_transfers,
-                    "output_dir": output_dir,
+                    "output_path": get_output_path(output_prefix, location_mapping),
                 },
             )
 
             p.start()
-            processes.append(p)
-            p_id_hex_id_map[p.pid] = h3_cell
+            running[p.sentinel] = (p, location_mapping)
 
-        while self.get_active_process_count(processes) > 0:
+        while len(running) > 0:
             if verbose:
-                self.print_status(processes, pbar)
-            errors_list.extend([errors.get() for _ in range(errors.qsize())])
-            if errors.full():
-                raise Exception("Error queue is full.")
-            time.sleep(1)
+                self.print_status(len(location_mappings), len(running), pbar)
+            errors_list.extend(
+                wait_for_processes(
+                    running, errors, start_time, max_transfers, output_prefix
+                )
+            )
         pbar.update(len(location_mappings) - pbar.n)
         pbar.close()
 
-        for p in processes:
-            p.join()
-
         rlog.info("All processes finished.")
 
-        while not errors.empty():
-            errors_list.append(errors.get())
+        errors_list.extend(drain_queue(errors))
         errors = errors_list
         if len(errors) > 0:
             rlog.warning(f"{len(errors)} errors occurred during the analysis.")
@@ -119,21 +118,17 @@ class MCR5:
         errors: Queue,
         h3_cell: str,
         osm_node_id: int,
-        initial_steps: StepBuilderMatrix,
-        repeating_steps: StepBuilderMatrix,
         start_time: str,
         max_transfers: int,
-        output_dir: str,
+        output_path: str,
     ) -> None:
-        output = os.path.join(output_dir, f"{h3_cell}.feather")
-
-        l, log_stream = make_string_stream_logger(f"mcr5-{h3_cell}", logging.DEBUG)
+        l, log_buffer = make_deque_logger(f"mcr5-{h3_cell}", logging.DEBUG)
         copy_settings_to_root_logger(l)
         mcr_config = MCRConfig(logger=l, disable_paths=True, enable_limit=True)
         try:
             mcr_runner = MCR(
-                initial_steps,
-                repeating_steps,
+                self.initial_steps,
+                self.repeating_steps,
                 mcr_config,
                 output_format=OutputFormat.DF_FEATHER,
             )
@@ -142,40 +137,92 @@ class MCR5:
                 start_node_id=osm_node_id,
                 start_time=start_time,
                 max_transfers=max_transfers,
-                output_path=output,
+                output_path=output_path,
             )
         except BaseException as e:
-            log_stream_value = log_stream.getvalue()
             errors.put(
                 {
                     "h3_cell": h3_cell,
                     "osm_node_id": osm_node_id,
                     "start_time": start_time,
                     "max_transfers": max_transfers,
-                    "output_path": output,
+                    "output_path": output_path,
                     "error": e.__repr__(),  # the exception object might not be pickable
-                    "logs": log_stream_value,
+                    "logs": log_buffer.getvalue(),
                 },
             )
 
     def print_status(
         self,
-        processes: list[Process],
+        started_processes: int,
+        active_processes_count: int,
         pbar: tqdm,
     ):
         available_memory = pretty_bytes(get_available_memory())
-        active_processes_count = self.get_active_process_count(processes)
 
-        started_processes = len(processes)
         finished_processes = started_processes - active_processes_count
-
         pbar.update(finished_processes - pbar.n)
         pbar.set_description(
             f"Available memory: {available_memory} | active: {active_processes_count}         ",
         )
 
-    def get_active_process_count(self, processes: list[Process]) -> int:
-        return sum(p.is_alive() for p in processes)
+
+def get_mp_context():
+    """
+    Returns the fork context where available. Forked processes inherit the steps
+    instead of receiving them pickled, so they are shared copy-on-write. Other
+    platforms fall back to the default context.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def wait_for_processes(
+    running: dict[int, tuple[BaseProcess, H3OSMLocationMapping]],
+    errors: Queue,
+    start_time: str,
+    max_transfers: int,
+    output_prefix: str,
+) -> list[dict]:
+    """
+    Blocks until one of the running processes exits or the scheduler timeout
+    passes, whichever happens first. Exited processes are removed from `running`.
+    Returns the errors reported in the meantime. Processes that were killed before
+    they could report anything, e.g. by the OOM killer, are reported as well.
+    """
+    exited = wait(list(running), timeout=SCHEDULER_TIMEOUT_SECONDS)
+    # a child only exits once its error is flushed, so drain before joining
+    new_errors = drain_queue(errors)
+    for sentinel in exited:
+        p, location_mapping = running.pop(sentinel)  # type: ignore
+        p.join()
+        if p.exitcode != 0:
+            new_errors.append(
+                {
+                    "h3_cell": location_mapping.h3_cell,
+                    "osm_node_id": location_mapping.osm_node_id,
+                    "start_time": start_time,
+                    "max_transfers": max_transfers,
+                    "output_path": get_output_path(output_prefix, location_mapping),
+                    "error": f"Process exited with code {p.exitcode}",
+                    "logs": "",
+                }
+            )
+    return new_errors
+
+
+def get_output_path(output_prefix: str, location_mapping: H3OSMLocationMapping):
+    return f"{output_prefix}{location_mapping.h3_cell}.feather"
+
+
+def drain_queue(queue: Queue) -> list:
+    items = []
+    while True:
+        try:
+            items.append(queue.get_nowait())
+        except Empty:
+            return items
 
 
 def get_available_memory() -> int:
@@ -1,10 +1,13 @@
 import geopandas as gpd
 import networkx as nx
-import osmnx as ox
+import numpy as np
 import pyrosm
+from scipy.spatial import cKDTree
 
 from package.logger import rlog
 
+EARTH_RADIUS_M = 6_371_009
+
 
 def create_nx_graph(
     osm: pyrosm.OSM, nodes: gpd.GeoDataFrame, edges: gpd.GeoDataFrame, network_type: str
@@ -38,12 +41,30 @@ def crop_graph_to_largest_component(
 def add_nearest_node_to_stops(
     stops_df: gpd.GeoDataFrame, nx_graph: nx.Graph
 ) -> gpd.GeoDataFrame:
-    nodes, dists = ox.nearest_nodes(
-        nx_graph,
-        stops_df.stop_lon.astype(float),  # TODO: improve this
-        stops_df.stop_lat.astype(float),
-        return_dist=True,
-    )  # type: ignore
-    stops_df["nearest_node"] = nodes
-    stops_df["nearest_node_dist"] = dists
+    node_ids, node_lats, node_lons = zip(
+        *((node, data["y"], data["x"]) for node, data in nx_graph.nodes(data=True))
+    )
+    kdtree = cKDTree(to_unit_sphere(np.array(node_lats), np.array(node_lons)))
+
+    chord_lengths, indices = kdtree.query(
+        to_unit_sphere(
+            stops_df.stop_lat.astype(float).to_numpy(),  # TODO: improve this
+            stops_df.stop_lon.astype(float).to_numpy(),
+        )
+    )
+
+    stops_df["nearest_node"] = np.array(node_ids)[indices]
+    # convert the chord length on the unit sphere to the great-circle distance
+    stops_df["nearest_node_dist"] = 2 * np.arcsin(chord_lengths / 2) * EARTH_RADIUS_M
     return stops_df
+
+
+def to_unit_sphere(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Converts coordinates to cartesian points on the unit sphere, where euclidean
+    nearest neighbors are also nearest neighbors in great-circle distance.
+    """
+    lats, lons = np.radians(lats), np.radians(lons)
+    return np.column_stack(
+        (np.cos(lats) * np.cos(lons), np.cos(lats) * np.sin(lons), np.sin(lats))
+    )
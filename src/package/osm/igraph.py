@@ -1,20 +1,27 @@
 import geopandas as gpd
 import igraph as ig
+import numpy as np
 import pyrosm
 from tqdm.contrib.concurrent import process_map
 
 from package import key
 from package.logger import Timed
 
+SOURCES_PER_BATCH = 64
 
-# retrieves a dictionary, where the keys are source and the values are a list of targets
-# returns a dictionary, where the keys are source and the values are a dictionary of targets and distances
+
+# retrieves the one-to-many queries in CSR layout, where the targets of sources[i]
+# are targets[indptr[i] : indptr[i + 1]]
+# returns flat arrays of source nodes, target nodes and their distances, unreachable
+# targets are omitted
 def query_multiple_one_to_many(
-    source_target_nodes_map: dict[int, list[int]],
+    sources: np.ndarray,
+    indptr: np.ndarray,
+    targets: np.ndarray,
     osm_reader: pyrosm.OSM,
     nodes: gpd.GeoDataFrame,
     edges: gpd.GeoDataFrame,
-) -> dict[int, dict[int, float]]:
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
     global i_graph  # will be used during multiprocessing
     # TODO: we could probably use a class to avoid this global variable
     with Timed.info("Creating igraph graph"):
@@ -26,34 +33,43 @@ def query_multiple_one_to_many(
     ) = get_conversion_maps(i_graph)
 
     # convert to igraph node ids
-    source_target_nodes_map_igraph: dict[int, list[int]] = {
-        node_id_to_g_igraph_node_id_map[node_id]: [
-            node_id_to_g_igraph_node_id_map[node_id] for node_id in nearby_nodes
-        ]
-        for node_id, nearby_nodes in source_target_nodes_map.items()
-    }
-
-    source_nodes, target_nodes_matrix = zip(*source_target_nodes_map_igraph.items())
-
-    res = process_map(
-        get_shortest_path_one_to_many,
-        source_nodes,
-        target_nodes_matrix,
-        chunksize=5,
+    to_igraph_node_id = node_id_to_g_igraph_node_id_map.__getitem__
+    source_nodes = np.fromiter(
+        map(to_igraph_node_id, sources), dtype=np.int64, count=len(sources)
+    )
+    target_nodes = np.fromiter(
+        map(to_igraph_node_id, targets), dtype=np.int64, count=len(targets)
+    )
+    target_nodes_matrix = [
+        target_nodes[start:end] for start, end in zip(indptr[:-1], indptr[1:])
+    ]
+
+    # each batch is solved by a single multi-source distance query
+    batch_starts = range(0, len(source_nodes), SOURCES_PER_BATCH)
+    res_batches = process_map(
+        get_distances_many_to_many,
+        [source_nodes[start : start + SOURCES_PER_BATCH] for start in batch_starts],
+        [
+            target_nodes_matrix[start : start + SOURCES_PER_BATCH]
+            for start in batch_starts
+        ],
         max_workers=key.DEFAULT_N_PROCESSES,
     )
+    res_source_nodes, res_target_nodes, res_distances = (
+        np.concatenate(res_arrays) for res_arrays in zip(*res_batches)
+    )
 
-    source_target_nodes_distance_map: dict[int, dict[int, float]] = {}
-    for source_node, nearby_nodes_with_distance in zip(source_nodes, res):
-        source_node = igraph_node_id_to_node_id_map[source_node]  # type: ignore
-        source_target_nodes_distance_map[source_node] = {
-            igraph_node_id_to_node_id_map[target_node]: distance
-            for target_node, distance in nearby_nodes_with_distance.items()
-        }
+    to_node_id = igraph_node_id_to_node_id_map.__getitem__
+    res_source_nodes = np.fromiter(
+        map(to_node_id, res_source_nodes), dtype=np.int64, count=len(res_source_nodes)
+    )
+    res_target_nodes = np.fromiter(
+        map(to_node_id, res_target_nodes), dtype=np.int64, count=len(res_target_nodes)
+    )
 
     del i_graph
 
-    return source_target_nodes_distance_map
+    return res_source_nodes, res_target_nodes, res_distances
 
 
 def get_conversion_maps(
@@ -76,25 +92,35 @@ def create_i_graph(
     return osm.to_graph(nodes, edges, graph_type="igraph", network_type="walking")  # type: ignore
 
 
-def get_shortest_path(source_node: int, target_node: int) -> int:
-    paths = i_graph.get_shortest_paths(
-        source_node,
-        target_node,
-        weights="length",
-        output="epath",
+def get_distances_many_to_many(
+    source_nodes: np.ndarray,
+    target_nodes_matrix: list[np.ndarray],
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calculates the distances from each source node to its target nodes.
+    All sources are queried against the union of their targets at once.
+    Returns flat arrays of source nodes, target nodes and distances, unreachable
+    targets are omitted.
+    """
+    target_nodes = np.concatenate(target_nodes_matrix)
+    union_target_nodes = np.unique(target_nodes)
+    distances = np.array(
+        i_graph.distances(
+            source=source_nodes.tolist(),
+            target=union_target_nodes.tolist(),
+            weights="length",
+        ),
+        dtype=np.float64,
+    ).reshape(len(source_nodes), len(union_target_nodes))
+
+    n_targets = [len(target_nodes) for target_nodes in target_nodes_matrix]
+    rows = np.repeat(np.arange(len(source_nodes)), n_targets)
+    columns = np.searchsorted(union_target_nodes, target_nodes)
+    target_distances = distances[rows, columns]
+
+    is_reachable = np.isfinite(target_distances)
+    return (
+        np.repeat(source_nodes, n_targets)[is_reachable],
+        target_nodes[is_reachable],
+        target_distances[is_reachable],
     )
-    path = paths[0]
-    return sum(i_graph.es[epath]["length"] for epath in path)
-
-
-def get_shortest_path_one_to_many(
-    source_node: int,
-    target_nodes: list[int],
-):
-    return {
-        target_stop: get_shortest_path(
-            source_node,
-            target_stop,
-        )
-        for target_stop in target_nodes
-    }
@@ -4,11 +4,15 @@ import pickle
 import geopandas as gpd
 import pandas as pd
 import requests
+import zstandard
 from typing_extensions import Any
 
 from package import key
 from package.gtfs import dtypes
 
+ZSTD_MAGIC_NUMBER = b"\x28\xb5\x2f\xfd"
+ZSTD_COMPRESSION_LEVEL = 3
+
 
 def write_dfs_dict(dfs_dict: dict[str, pd.DataFrame], output_path: str):
     os.makedirs(output_path, exist_ok=True)
@@ -42,16 +46,36 @@ def read_gdf(path: str) -> gpd.GeoDataFrame:
     ).set_crs("EPSG:4326")
 
 
-def write_any_dict(data: dict[str, Any], output_path: str):
+def write_any_dict(data: dict[str, Any], output_path: str, compress: bool = False):
+    """
+    Pickles the data to the given path.
+    If compress is set, the pickle is additionally compressed with zstd.
+    """
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
     with open(output_path, "wb") as f:
-        pickle.dump(data, f)
+        if not compress:
+            pickle.dump(data, f)
+            return
+
+        compressor = zstandard.ZstdCompressor(level=ZSTD_COMPRESSION_LEVEL)
+        with compressor.stream_writer(f, closefd=False) as writer:
+            pickle.dump(data, writer, protocol=pickle.HIGHEST_PROTOCOL)
 
 
 def read_any_dict(path: str) -> dict[str, Any]:
+    """
+    Reads data written by write_any_dict, zstd compressed files are detected
+    by their magic number.
+    """
     with open(path, "rb") as f:
-        return pickle.load(f)
+        is_compressed = f.read(len(ZSTD_MAGIC_NUMBER)) == ZSTD_MAGIC_NUMBER
+        f.seek(0)
+        if not is_compressed:
+            return pickle.load(f)
+
+        with zstandard.ZstdDecompressor().stream_reader(f, closefd=False) as reader:
+            return pickle.load(reader)
 
 
 def get_tmp_path(*paths: str) -> str: